@@ -0,0 +1,407 @@
+# main.py
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Literal, List
+from azure.storage.blob import BlobServiceClient, BlobPrefix
+import boto3
+import requests
+from requests.adapters import HTTPAdapter
+from botocore.config import Config
+from botocore.exceptions import ClientError
+import libpresign
+import orjson
+from base64 import b64decode, b64encode
+from itertools import chain, islice
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+from urllib.parse import quote, urlencode
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()  # loads AZURE_* and AWS_* from your .env
+
+logger = logging.getLogger(__name__)
+
+# Azure SAS signing is HMAC-SHA256 bound; OpenSSL's sha256 uses SHA-NI where available
+if hashlib.sha256.__name__ != "openssl_sha256":
+    logger.warning("hashlib.sha256 is not OpenSSL-backed; Azure SAS signing will be slow")
+
+# Read once at import; a source whose credentials are missing stays
+# disabled (its requests get a 500) so single-cloud deployments still start.
+AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+AZURE_ACCOUNT_KEY = os.getenv("AZURE_ACCOUNT_KEY")
+AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+AZURE_CONFIGURED = bool(AZURE_STORAGE_CONNECTION_STRING and AZURE_ACCOUNT_KEY)
+S3_CONFIGURED = bool(AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY)
+if not AZURE_CONFIGURED:
+    logger.warning("Azure credentials not set; source_type=azure is disabled")
+if not S3_CONFIGURED:
+    logger.warning("AWS credentials not set; source_type=s3 is disabled")
+
+AWS_REGION = os.getenv("AWS_REGION") or None  # else boto3's own resolution
+S3_MAX_EXPIRY_DAYS = 7  # SigV4 presigned URLs live at most 604800s
+AZURE_SAS_VERSION = "2025-05-05"  # matches azure-storage-blob 12.25.x
+LIST_CONCURRENCY = int(os.getenv("AUDIO_LIST_CONCURRENCY") or 32)
+SHARDS_PER_REQUEST = int(os.getenv("AUDIO_SHARDS_PER_REQUEST") or 4)
+# keep-alive connections per SDK client: every list_pool thread, plus room
+# for the level-listing prefetch threads and bucket region lookups that run
+# outside it; past this urllib3 opens a connection per call and discards it
+SDK_POOL_CONNECTIONS = LIST_CONCURRENCY + 16
+S3_PAGE_SIZE = 1000  # list_objects_v2 maximum
+SIGN_BATCH_MAX_KEYS = 1000
+# all four characters long, so keys are checked with name[-4:]
+AUDIO_EXTENSIONS = frozenset((".wav", ".mp3", ".m4a"))
+
+class AzureSasBuilder:
+    """Read-only blob SAS signer for one container and expiry.
+
+    Produces the same token as ``generate_blob_sas`` with an account key,
+    but the string-to-sign prefix is hashed once and only the blob name
+    and constant tail are fed to a copy of that HMAC state per blob.
+    """
+
+    def __init__(self, account_name, account_key, container, permission, expiry):
+        se = expiry.strftime("%Y-%m-%dT%H:%M:%SZ")
+        prefix = f"{permission}\n\n{se}\n/blob/{account_name}/{container}/"
+        # end of resource, empty sid/sip/spr, sv, sr, then seven empty optional fields
+        self._tail = ("\n" * 4 + AZURE_SAS_VERSION + "\nb" + "\n" * 7).encode()
+        self._hmac = hmac.new(b64decode(account_key), prefix.encode(), digestmod=hashlib.sha256)
+        params = {"se": se, "sp": permission, "sv": AZURE_SAS_VERSION, "sr": "b"}
+        self._query = urlencode(params) + "&sig="
+
+    def sign(self, blob_name):
+        h = self._hmac.copy()
+        h.update(blob_name.encode())
+        h.update(self._tail)
+        return self._query + quote(b64encode(h.digest()))
+
+# SDK clients are expensive to build (boto3 loads its service model JSON)
+# and safe to share, so each is created once per process on first use.
+
+@lru_cache(maxsize=1)
+def azure_service():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=SDK_POOL_CONNECTIONS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING, session=session)
+
+@lru_cache(maxsize=1)
+def s3_client():
+    return boto3.client(
+        "s3",
+        region_name           = AWS_REGION,
+        aws_access_key_id     = AWS_ACCESS_KEY_ID,
+        aws_secret_access_key = AWS_SECRET_ACCESS_KEY,
+        config                = Config(max_pool_connections=SDK_POOL_CONNECTIONS),
+    )
+
+@lru_cache(maxsize=1)
+def s3_list_paginator():
+    return s3_client().get_paginator("list_objects_v2")
+
+@lru_cache(maxsize=16)
+def s3_path_style_client(region):
+    return boto3.client(
+        "s3",
+        region_name           = region,
+        aws_access_key_id     = AWS_ACCESS_KEY_ID,
+        aws_secret_access_key = AWS_SECRET_ACCESS_KEY,
+        config                = Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+    )
+
+bucket_regions = {}  # only successful lookups; a bucket's region never changes
+
+def s3_bucket_region(bucket):
+    """Region SigV4 URLs for bucket must be scoped to."""
+    if bucket in bucket_regions:
+        return bucket_regions[bucket]
+    try:
+        location = s3_client().get_bucket_location(Bucket=bucket)["LocationConstraint"]
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "AccessDenied":
+            raise  # missing bucket, throttling, 5xx: fail this request only
+        # no s3:GetBucketLocation permission; trust the configured region,
+        # uncached so a later grant takes effect
+        return s3_client().meta.region_name
+    # us-east-1 buckets report no constraint, and "EU" is legacy eu-west-1
+    region = {None: "us-east-1", "EU": "eu-west-1"}.get(location, location)
+    bucket_regions[bucket] = region
+    return region
+
+@lru_cache(maxsize=32)
+def azure_sas_builder(account_name, account_key, container, expiry):
+    return AzureSasBuilder(
+        account_name = account_name,
+        account_key  = account_key,
+        container    = container,
+        permission   = "r",
+        expiry       = expiry,
+    )
+
+# Listings are sharded on the first "/" below the prefix: one delimited
+# listing yields the loose objects plus every sub-prefix, and the
+# sub-prefixes (a true partition of the keyspace) are then listed in
+# parallel on one process-wide pool, so concurrent requests together never
+# run more than LIST_CONCURRENCY listings. Each request keeps at most
+# SHARDS_PER_REQUEST shards started ahead (one page fetch each), so
+# requests interleave on the pool instead of one waiting out another's
+# backlog. Shards stream page by page and keys come out in lexicographic
+# order, exactly as a flat listing returns them. The SDK clients are
+# thread-safe.
+
+list_pool = ThreadPoolExecutor(LIST_CONCURRENCY, thread_name_prefix="list")
+
+def prefetch(pages):
+    """Yield pages while the next one is already being fetched.
+
+    Hides the listing round-trip behind the caller's work on the current
+    page; the iterator is still only advanced by one thread at a time.
+    The fetch runs on a thread of its own rather than on list_pool, so
+    it never queues behind other requests' shard listings.
+    """
+    pages = iter(pages)
+    with ThreadPoolExecutor(1, thread_name_prefix="prefetch") as fetcher:
+        future = fetcher.submit(next, pages, None)
+        while (page := future.result()) is not None:
+            future = fetcher.submit(next, pages, None)
+            yield page
+
+class ShardReader:
+    """Pages of one shard, fetched on list_pool one page ahead of the reader."""
+
+    def __init__(self, pages):
+        self._pages = iter(pages)
+        self._future = None
+
+    def start(self):
+        if self._future is None:
+            self._future = list_pool.submit(next, self._pages, None)
+
+    def cancel(self):
+        if self._future is not None:
+            self._future.cancel()
+
+    def __iter__(self):
+        self.start()
+        while (page := self._future.result()) is not None:
+            self._future = list_pool.submit(next, self._pages, None)
+            yield page
+
+def list_audio(level_pages, shard_pages, prefix):
+    """Yield audio keys under prefix in lexicographic order.
+
+    level_pages(prefix) yields pages of sorted (name, is_prefix) pairs from
+    a "/"-delimited listing; shard_pages(prefix) yields pages of keys from
+    a flat one. Both only return audio keys.
+    """
+    # Levels holding nothing but a single sub-prefix (e.g. everything under
+    # "recordings/") are descended first, so such layouts still shard.
+    while True:
+        pages = prefetch(level_pages(prefix))
+        head = list(islice(pages, 2))
+        if len(head) == 1 and len(head[0]) == 1 and head[0][0][1]:
+            prefix = head[0][0][0]
+            continue
+        break
+
+    for page in chain(head, pages):
+        readers = [ShardReader(shard_pages(name)) for name, is_prefix in page if is_prefix]
+        for reader in readers[:SHARDS_PER_REQUEST]:
+            reader.start()
+        upcoming = iter(readers[SHARDS_PER_REQUEST:])
+        shards = iter(readers)
+        try:
+            for name, is_prefix in page:
+                if not is_prefix:
+                    yield name
+                    continue
+                for keys in next(shards):
+                    yield from keys
+                for reader in islice(upcoming, 1):
+                    reader.start()
+        finally:
+            for reader in readers:
+                reader.cancel()
+
+def list_azure_audio_names(container, prefix):
+    def level_pages(sub):
+        listing = container.walk_blobs(name_starts_with=sub, delimiter="/")
+        for page in listing.by_page():
+            yield sorted(
+                (item.name, isinstance(item, BlobPrefix))
+                for item in page
+                if isinstance(item, BlobPrefix) or item.name[-4:].lower() in AUDIO_EXTENSIONS
+            )
+
+    def shard_pages(sub):
+        for page in container.list_blob_names(name_starts_with=sub).by_page():
+            yield [name for name in page if name[-4:].lower() in AUDIO_EXTENSIONS]
+
+    return list_audio(level_pages, shard_pages, prefix)
+
+def list_s3_audio_keys(paginator, bucket, prefix):
+    def level_pages(sub):
+        pages = paginator.paginate(
+            Bucket           = bucket,
+            Prefix           = sub,
+            Delimiter        = "/",
+            PaginationConfig = {"PageSize": S3_PAGE_SIZE},
+        )
+        for page in pages:
+            keys = (obj["Key"] for obj in page.get("Contents", []))
+            yield sorted(
+                [(key, False) for key in keys if key[-4:].lower() in AUDIO_EXTENSIONS]
+                + [(p["Prefix"], True) for p in page.get("CommonPrefixes", [])]
+            )
+
+    def shard_pages(sub):
+        pages = paginator.paginate(
+            Bucket=bucket, Prefix=sub, PaginationConfig={"PageSize": S3_PAGE_SIZE}
+        )
+        for page in pages:
+            keys = (obj["Key"] for obj in page.get("Contents", []))
+            yield [key for key in keys if key[-4:].lower() in AUDIO_EXTENSIONS]
+
+    return list_audio(level_pages, shard_pages, prefix)
+
+def json_array_chunks(records, batch_size=1000):
+    """Serialize dict records as one JSON array, emitted batch_size at a time."""
+    records = iter(records)
+    sep = b"["
+    while batch := list(islice(records, batch_size)):
+        # strip orjson's own brackets so batches splice into one array
+        yield sep + orjson.dumps(batch)[1:-1]
+        sep = b","
+    yield b"]" if sep == b"," else b"[]"
+
+def check_credentials(source_type):
+    if source_type == "azure":
+        if not AZURE_CONFIGURED:
+            raise HTTPException(500, "Azure credentials not set")
+    elif source_type == "s3":
+        if not S3_CONFIGURED:
+            raise HTTPException(500, "AWS credentials not set")
+    else:
+        raise HTTPException(400, "Invalid source_type")
+
+def check_expiry_days(source_type, expiry_days):
+    if expiry_days < 1:
+        raise HTTPException(400, "expiry_days must be at least 1")
+    if source_type == "s3" and expiry_days > S3_MAX_EXPIRY_DAYS:
+        raise HTTPException(400, f"expiry_days must be at most {S3_MAX_EXPIRY_DAYS} for s3")
+
+def url_signer(source_type, container_or_bucket, expiry_days):
+    """Return a function mapping an object key to its signed read URL."""
+    if source_type == "azure":
+        # Rounded up to the hour so that, within that hour, repeat calls reuse
+        # the cached signer and return byte-identical (cacheable) Azure URLs.
+        expiry = (datetime.utcnow() + timedelta(days=expiry_days, hours=1)).replace(
+            minute=0, second=0, microsecond=0
+        )
+        svc = azure_service()
+        signer = azure_sas_builder(svc.account_name, AZURE_ACCOUNT_KEY, container_or_bucket, expiry)
+        url_prefix = (
+            f"https://{svc.account_name}"
+            f".blob.core.windows.net/{container_or_bucket}/"
+        )
+
+        def sign(name):
+            return url_prefix + quote(name, safe="/") + "?" + signer.sign(name)
+
+    elif "." in container_or_bucket:
+        # libpresign only builds virtual-hosted URLs, whose host fails TLS
+        # for dotted bucket names, so these are signed path-style by botocore
+        client = s3_path_style_client(s3_bucket_region(container_or_bucket))
+        expires = expiry_days * 24 * 3600
+
+        def sign(key):
+            return client.generate_presigned_url(
+                ClientMethod = "get_object",
+                Params       = {"Bucket": container_or_bucket, "Key": key},
+                ExpiresIn    = expires,
+            )
+
+    else:
+        region = s3_bucket_region(container_or_bucket)
+        endpoint = f"s3.{region}.amazonaws.com"
+        expires = expiry_days * 24 * 3600
+
+        def sign(key):
+            return libpresign.get(
+                access_key_id     = AWS_ACCESS_KEY_ID,
+                secret_access_key = AWS_SECRET_ACCESS_KEY,
+                region            = region,
+                bucket            = container_or_bucket,
+                key               = key,
+                expires           = expires,
+                endpoint          = endpoint,
+            )
+
+    return sign
+
+app = FastAPI(default_response_class=ORJSONResponse)
+
+class ExtractRequest(BaseModel):
+    source_type: Literal["azure", "s3"]
+    container_or_bucket: str
+    prefix: str
+    expiry_days: int = 7
+    sign: bool = True  # False returns paths only, with url=""
+
+class SignBatchRequest(BaseModel):
+    source_type: Literal["azure", "s3"]
+    container_or_bucket: str
+    keys: List[str] = Field(max_length=SIGN_BATCH_MAX_KEYS)
+    expiry_days: int = 7
+
+class FileRecord(BaseModel):
+    path: str
+    url: str
+
+@app.post("/extract-audio-urls", response_model=List[FileRecord])
+async def extract_audio_urls(req: ExtractRequest):
+    check_credentials(req.source_type)
+
+    if req.source_type == "azure":
+        container = azure_service().get_container_client(req.container_or_bucket)
+        keys = list_azure_audio_names(container, req.prefix)
+    else:
+        keys = list_s3_audio_keys(s3_list_paginator(), req.container_or_bucket, req.prefix)
+
+    if req.sign:
+        check_expiry_days(req.source_type, req.expiry_days)
+        # may look up the bucket's region, so it is kept off the event loop
+        sign = await asyncio.to_thread(
+            url_signer, req.source_type, req.container_or_bucket, req.expiry_days
+        )
+        records = ({"path": key, "url": sign(key)} for key in keys)
+    else:
+        records = ({"path": key, "url": ""} for key in keys)
+
+    # The listing SDKs are blocking, so none of it may run on the event loop:
+    # the first batch is pulled in a worker thread (which also lets a missing
+    # container/bucket fail the request before a 200 is sent) and Starlette
+    # drains the rest of the sync generator in its threadpool.
+    chunks = json_array_chunks(records)
+    first = await asyncio.to_thread(next, chunks)
+    return StreamingResponse(chain((first,), chunks), media_type="application/json")
+
+@app.post("/sign-batch", response_model=List[FileRecord])
+def sign_batch(req: SignBatchRequest):
+    check_credentials(req.source_type)
+    check_expiry_days(req.source_type, req.expiry_days)
+    for key in req.keys:
+        if key[-4:].lower() not in AUDIO_EXTENSIONS:
+            raise HTTPException(400, f"Not an audio file: {key}")
+
+    sign = url_signer(req.source_type, req.container_or_bucket, req.expiry_days)
+    return [{"path": key, "url": sign(key)} for key in req.keys]
@@ -0,0 +1,16 @@
+import base64
+import os
+
+# main reads credentials at import time, so fake ones must be set first
+ACCOUNT_KEY = base64.b64encode(b"k" * 64).decode()
+
+os.environ.update(
+    AZURE_STORAGE_CONNECTION_STRING=(
+        "DefaultEndpointsProtocol=https;AccountName=acct;"
+        f"AccountKey={ACCOUNT_KEY};EndpointSuffix=core.windows.net"
+    ),
+    AZURE_ACCOUNT_KEY=ACCOUNT_KEY,
+    AWS_ACCESS_KEY_ID="testing",
+    AWS_SECRET_ACCESS_KEY="testing",
+    AWS_DEFAULT_REGION="us-east-1",
+)
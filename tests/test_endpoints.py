@@ -0,0 +1,142 @@
+from urllib.parse import parse_qs, urlsplit
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+from fastapi.testclient import TestClient
+from moto import mock_aws
+
+import main
+
+client = TestClient(main.app)
+# unhandled errors come back as a 500 instead of being re-raised in the test
+server = TestClient(main.app, raise_server_exceptions=False)
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        for cached in (main.s3_client, main.s3_list_paginator, main.s3_path_style_client):
+            cached.cache_clear()
+        main.bucket_regions.clear()
+        yield boto3.client("s3", region_name="us-east-1")
+
+def sign_batch(**body):
+    body.setdefault("keys", ["a.wav"])
+    return client.post("/sign-batch", json=body)
+
+def test_sign_batch_uses_bucket_region(s3):
+    s3.create_bucket(
+        Bucket                    = "audio-eu",
+        CreateBucketConfiguration = {"LocationConstraint": "eu-west-1"},
+    )
+    resp = sign_batch(source_type="s3", container_or_bucket="audio-eu")
+    assert resp.status_code == 200
+    url = urlsplit(resp.json()[0]["url"])
+    assert url.netloc == "audio-eu.s3.eu-west-1.amazonaws.com"
+    assert "/eu-west-1/s3/" in parse_qs(url.query)["X-Amz-Credential"][0]
+
+def test_missing_bucket_region_is_not_cached(s3):
+    body = {"source_type": "s3", "container_or_bucket": "audio-eu", "keys": ["a.wav"]}
+    assert server.post("/sign-batch", json=body).status_code == 500
+    s3.create_bucket(
+        Bucket                    = "audio-eu",
+        CreateBucketConfiguration = {"LocationConstraint": "eu-west-1"},
+    )
+    resp = server.post("/sign-batch", json=body)
+    assert resp.status_code == 200
+    assert urlsplit(resp.json()[0]["url"]).netloc == "audio-eu.s3.eu-west-1.amazonaws.com"
+
+def test_bucket_region_falls_back_only_on_access_denied(s3):
+    with Stubber(main.s3_client()) as stub:
+        stub.add_client_error("get_bucket_location", "AccessDenied", http_status_code=403)
+        stub.add_client_error("get_bucket_location", "SlowDown", http_status_code=503)
+        assert main.s3_bucket_region("audio") == "us-east-1"
+        with pytest.raises(main.ClientError):
+            main.s3_bucket_region("audio")
+    assert main.bucket_regions == {}
+
+def test_sign_batch_dotted_bucket_is_path_style(s3):
+    s3.create_bucket(Bucket="audio.example.com")
+    resp = sign_batch(source_type="s3", container_or_bucket="audio.example.com")
+    assert resp.status_code == 200
+    url = urlsplit(resp.json()[0]["url"])
+    assert "audio.example.com" not in url.netloc
+    assert url.path == "/audio.example.com/a.wav"
+    assert parse_qs(url.query)["X-Amz-Algorithm"] == ["AWS4-HMAC-SHA256"]
+
+@pytest.mark.parametrize("source_type,expiry_days,status", [
+    ("s3", 0, 400),
+    ("s3", -3, 400),
+    ("s3", 7, 200),
+    ("s3", 8, 400),
+    ("azure", 0, 400),
+    ("azure", 30, 200),
+])
+def test_expiry_days_is_validated(s3, source_type, expiry_days, status):
+    s3.create_bucket(Bucket="audio")
+    resp = sign_batch(source_type=source_type, container_or_bucket="audio", expiry_days=expiry_days)
+    assert resp.status_code == status
+
+def test_extract_rejects_s3_expiry_over_seven_days(s3):
+    resp = client.post("/extract-audio-urls", json={
+        "source_type": "s3", "container_or_bucket": "audio", "prefix": "", "expiry_days": 8,
+    })
+    assert resp.status_code == 400
+
+def test_sign_batch_rejects_non_audio_keys(s3):
+    s3.create_bucket(Bucket="audio")
+    resp = sign_batch(source_type="s3", container_or_bucket="audio", keys=["a.wav", "notes.txt"])
+    assert resp.status_code == 400
+
+def test_sign_batch_limits_key_count(s3):
+    s3.create_bucket(Bucket="audio")
+    keys = [f"{i}.wav" for i in range(main.SIGN_BATCH_MAX_KEYS)]
+    assert sign_batch(source_type="s3", container_or_bucket="audio", keys=keys).status_code == 200
+    keys.append("one-too-many.wav")
+    assert sign_batch(source_type="s3", container_or_bucket="audio", keys=keys).status_code == 422
+
+def extract(**body):
+    body.setdefault("source_type", "s3")
+    body.setdefault("container_or_bucket", "audio")
+    body.setdefault("prefix", "")
+    return server.post("/extract-audio-urls", json=body)
+
+def put_audio(s3):
+    s3.create_bucket(Bucket="audio")
+    keys = [f"{d}/{i:04}.wav" for d in ("b", "a") for i in range(1100)] + ["c.mp3", "notes.txt"]
+    for key in keys:
+        s3.put_object(Bucket="audio", Key=key, Body=b"")
+    return sorted(k for k in keys if k[-4:] in main.AUDIO_EXTENSIONS)
+
+def test_extract_streams_signed_listing(s3):
+    keys = put_audio(s3)
+    resp = extract()
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    records = resp.json()
+    assert [r["path"] for r in records] == keys
+    for record in records:
+        url = urlsplit(record["url"])
+        assert url.netloc == "audio.s3.us-east-1.amazonaws.com"
+        assert url.path == "/" + record["path"]
+        assert parse_qs(url.query)["X-Amz-Expires"] == ["604800"]
+
+def test_extract_missing_bucket_is_a_500(s3):
+    # unsigned, so the error comes from the listing's first batch, which is
+    # pulled before the 200 is sent rather than from the region lookup
+    assert extract(container_or_bucket="no-such-bucket", sign=False).status_code == 500
+
+def test_extract_unsigned_returns_paths_only(s3, monkeypatch):
+    keys = put_audio(s3)
+    signed = extract().json()
+
+    def no_signer(*args):
+        raise AssertionError("unsigned listing built a signer")
+
+    monkeypatch.setattr(main, "url_signer", no_signer)
+    # no URL is signed, so an expiry past the s3 limit is irrelevant
+    resp = extract(sign=False, expiry_days=8)
+    assert resp.status_code == 200
+    records = resp.json()
+    assert [r["path"] for r in records] == [r["path"] for r in signed] == keys
+    assert all(r["url"] == "" for r in records)
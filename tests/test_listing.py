@@ -0,0 +1,152 @@
+import threading
+
+import boto3
+import pytest
+from moto import mock_aws
+
+import main
+
+def test_prefetch_does_not_wait_for_a_busy_list_pool():
+    # occupy every list_pool worker, as a large sharded listing would
+    release = threading.Event()
+    blockers = [main.list_pool.submit(release.wait) for _ in range(main.LIST_CONCURRENCY)]
+    try:
+        result = []
+        reader = threading.Thread(target=lambda: result.extend(main.prefetch(iter([[1], [2], [3]]))))
+        reader.start()
+        reader.join(timeout=5)
+        assert result == [[1], [2], [3]]
+    finally:
+        release.set()
+        for blocker in blockers:
+            blocker.result()
+
+def test_sdk_pools_cover_list_concurrency():
+    main.s3_client.cache_clear()
+    main.azure_service.cache_clear()
+    try:
+        assert main.s3_client().meta.config.max_pool_connections > main.LIST_CONCURRENCY
+        session = main.azure_service()._pipeline._transport.session
+        assert session.get_adapter("https://acct.blob.core.windows.net")._pool_maxsize > main.LIST_CONCURRENCY
+    finally:
+        main.s3_client.cache_clear()
+        main.azure_service.cache_clear()
+
+class FakeListing:
+    """level/shard page sources over a fixed tree, recording every page fetch."""
+
+    def __init__(self, levels, shards):
+        self.levels = levels
+        self.shards = shards
+        self.fetched = []
+        self.lock = threading.Lock()
+
+    def level_pages(self, prefix):
+        yield from self.levels[prefix]
+
+    def shard_pages(self, prefix):
+        for i, page in enumerate(self.shards[prefix]):
+            with self.lock:
+                self.fetched.append((prefix, i))
+            yield page
+
+def test_list_audio_descends_single_folder_levels():
+    fake = FakeListing(
+        levels={
+            "": [[("recordings/", True)]],
+            "recordings/": [[("recordings/a/", True), ("recordings/b.wav", False), ("recordings/c/", True)]],
+        },
+        shards={"recordings/a/": [["recordings/a/1.wav"]], "recordings/c/": [["recordings/c/2.wav"]]},
+    )
+    keys = list(main.list_audio(fake.level_pages, fake.shard_pages, ""))
+    assert keys == ["recordings/a/1.wav", "recordings/b.wav", "recordings/c/2.wav"]
+    assert {prefix for prefix, _ in fake.fetched} == {"recordings/a/", "recordings/c/"}
+
+def test_list_audio_streams_shards_within_the_window():
+    shard_names = [f"d{i:03d}/" for i in range(50)]
+    fake = FakeListing(
+        levels={"": [[(name, True) for name in shard_names]]},
+        shards={name: [[f"{name}{p}.wav"] for p in range(10)] for name in shard_names},
+    )
+    keys = main.list_audio(fake.level_pages, fake.shard_pages, "")
+    assert next(keys) == "d000/0.wav"
+    for future in [main.list_pool.submit(lambda: None) for _ in range(main.LIST_CONCURRENCY)]:
+        future.result()
+    started = {prefix for prefix, _ in fake.fetched}
+    assert len(started) <= main.SHARDS_PER_REQUEST
+    # the shard being read is one page ahead, not fully listed
+    assert sum(prefix == "d000/" for prefix, _ in fake.fetched) <= 2
+    keys.close()
+
+@pytest.fixture
+def bucket():
+    with mock_aws():
+        main.s3_client.cache_clear()
+        main.s3_list_paginator.cache_clear()
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="audio")
+        yield s3
+
+KEYS = [
+    "root.mp3", "z.wav", "notes.txt", "a/1.MP3", "a.wav", "a-b/2.m4a",
+    "recordings/2024/01/x.wav", "recordings/2024/01/y.txt", "recordings/2024/02/z.wav",
+    "recordings/2024.wav", "recordings/2025/01/q.wav",
+] + [f"recordings/flat/{i:04d}.wav" for i in range(1200)]
+
+@pytest.mark.parametrize("prefix", ["", "a", "recordings/", "recordings/2024", "missing/"])
+def test_s3_listing_matches_flat_lexicographic_listing(bucket, prefix):
+    for key in KEYS:
+        bucket.put_object(Bucket="audio", Key=key, Body=b"")
+    keys = list(main.list_s3_audio_keys(main.s3_list_paginator(), "audio", prefix))
+    expected = sorted(
+        key for key in KEYS
+        if key.startswith(prefix) and key[-4:].lower() in main.AUDIO_EXTENSIONS
+    )
+    assert keys == expected
+
+class FakePaged(list):
+    def by_page(self, size=2):
+        return [self[i:i + size] for i in range(0, len(self), size)] or [[]]
+
+class FakeWalkPaged(FakePaged):
+    def by_page(self, size=2):
+        # like the SDK, each page lists its sub-prefixes ahead of its blobs
+        return [
+            sorted(page, key=lambda item: not isinstance(item, main.BlobPrefix))
+            for page in super().by_page(size)
+        ]
+
+class FakeBlob:
+    def __init__(self, name):
+        self.name = name
+
+class FakeContainer:
+    """Mimics the ContainerClient listing calls over a fixed set of names."""
+
+    def __init__(self, names):
+        self.names = sorted(names)
+
+    def walk_blobs(self, name_starts_with, delimiter):
+        items = []
+        for name in self.names:
+            if not name.startswith(name_starts_with):
+                continue
+            head, sep, _ = name[len(name_starts_with):].partition(delimiter)
+            prefix = name_starts_with + head + sep
+            if not sep:
+                items.append(FakeBlob(name))
+            elif not items or items[-1].name != prefix:
+                items.append(main.BlobPrefix(prefix=prefix))
+        return FakeWalkPaged(items)
+
+    def list_blob_names(self, name_starts_with):
+        return FakePaged(n for n in self.names if n.startswith(name_starts_with))
+
+@pytest.mark.parametrize("prefix", ["", "recordings/", "a"])
+def test_azure_listing_matches_flat_lexicographic_listing(prefix):
+    keys = list(main.list_azure_audio_names(FakeContainer(KEYS), prefix))
+    expected = sorted(
+        key for key in KEYS
+        if key.startswith(prefix) and key[-4:].lower() in main.AUDIO_EXTENSIONS
+    )
+    assert keys == expected
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+
+import pytest
+from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+from conftest import ACCOUNT_KEY
+from main import AzureSasBuilder
+
+EXPIRY = datetime(2030, 1, 2, 3, 0, 0)
+
+@pytest.mark.parametrize("name", [
+    "plain.wav",
+    "dir/sub dir/with space.mp3",
+    "hash#and?question.m4a",
+    "a+b=c&d.wav",
+    "ünïcødé/日本語.wav",
+])
+def test_sign_matches_generate_blob_sas(name):
+    signer = AzureSasBuilder("acct", ACCOUNT_KEY, "cont", "r", EXPIRY)
+    expected = generate_blob_sas(
+        account_name   = "acct",
+        account_key    = ACCOUNT_KEY,
+        container_name = "cont",
+        blob_name      = name,
+        permission     = BlobSasPermissions(read=True),
+        expiry         = EXPIRY,
+    )
+    token = signer.sign(name)
+    assert parse_qs(token) == parse_qs(expected)
+    assert token == expected
+
+def test_signer_is_reusable_across_blobs():
+    signer = AzureSasBuilder("acct", ACCOUNT_KEY, "cont", "r", EXPIRY + timedelta(days=1))
+    assert signer.sign("a.wav") != signer.sign("b.wav")
+    assert signer.sign("a.wav") == signer.sign("a.wav")
@@ -0,0 +1,17 @@
+import json
+
+import pytest
+
+from main import json_array_chunks
+
+@pytest.mark.parametrize("count", [0, 1, 999, 1000, 1001, 2000, 2500])
+def test_json_array_chunks_is_one_valid_array(count):
+    records = [{"path": f"k{i}.wav", "url": f"u{i}"} for i in range(count)]
+    chunks = list(json_array_chunks(iter(records), batch_size=1000))
+    assert json.loads(b"".join(chunks)) == records
+
+def test_json_array_chunks_batches():
+    records = ({"path": str(i), "url": ""} for i in range(2000))
+    chunks = list(json_array_chunks(records, batch_size=1000))
+    # two full batches, then the closing bracket on its own
+    assert len(chunks) == 3 and chunks[-1] == b"]"